@@ -1,12 +1,16 @@
 import os
+import re
 from contextlib import asynccontextmanager
 
-from fastapi import Depends, FastAPI, HTTPException, status
+import anyio.to_thread
+from fastapi import Depends, FastAPI, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import ValidationError
-from sqlalchemy import func
-from sqlalchemy.exc import NoResultFound
-from sqlmodel import Session, SQLModel, select
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import func, lambda_stmt, text, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import raiseload, selectinload
+from sqlmodel import Session, SQLModel, delete, insert, select
 
 from .db import (
     CodeOrID,
@@ -17,20 +21,28 @@ from .db import (
     Task,
     TaskCreate,
     TaskPatch,
+    TaskSummary,
     TaskWithDependencies,
     TeamEnum,
     engine,
+    get_read_session,
     get_session,
 )
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Os handlers são `def` de propósito: FastAPI os despacha para o
+    # threadpool do anyio, mantendo o acesso síncrono ao banco fora do event
+    # loop. O limite default (40 threads) vira gargalo sob carga.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = 200
+
     if os.getenv("DATABASE_RESET", "false").lower() != "false":
         print("Resetting database...")
         SQLModel.metadata.drop_all(engine)
 
-    SQLModel.metadata.create_all(engine)
+    if os.getenv("DATABASE_SKIP_CREATE", "false").lower() == "false":
+        SQLModel.metadata.create_all(engine)
 
     if os.getenv("DATABASE_POPULATE", "false").lower() != "false":
         from .mock import create_mock_data
@@ -46,14 +58,19 @@ app = FastAPI(
     description="API for managing teams and tasks",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Sem CORS_ORIGINS definido o middleware nem é instalado, evitando o custo
+# por request de processar os headers de CORS em uma API interna.
+_cors_origins = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "").split(",") if origin.strip()]
+if _cors_origins:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=_cors_origins,
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "PATCH", "DELETE"],
+        allow_headers=["content-type", "authorization"],
+    )
 
 
 @app.get("/health")
@@ -61,6 +78,75 @@ def health_check():
     return {"status": "UP"}
 
 
+@app.exception_handler(IntegrityError)
+def integrity_error_handler(request: Request, exc: IntegrityError):
+    # Violações de constraint (PK/UNIQUE/FK) são conflitos com o estado atual
+    # dos dados, não erros do servidor: respondem 409 em vez de vazar um 500.
+    return ORJSONResponse(status_code=status.HTTP_409_CONFLICT, content={"detail": "Request conflicts with existing data."})
+
+
+# Colunas que um PATCH pode alterar; chaves fora desses conjuntos são ignoradas.
+_CASE_MUTABLE = frozenset(CaseCreate.model_fields)
+_TASK_MUTABLE = frozenset(TaskCreate.model_fields) - {"dependencies"}
+
+
+# Um único match em C valida e separa o identificador ("1") do código ("DEV-1").
+_CODE_RE = re.compile(r"\A(?:(\d+)|([A-Z]+)-(\d+))\Z")
+
+
+def code_or_id_clauses(id_or_code: str):
+    """
+    Converte um identificador ou código de tarefa em cláusulas WHERE para `Task`.
+    """
+    m = _CODE_RE.match(id_or_code)
+    if not m:
+        raise HTTPException(status_code=400, detail=f"Invalid task code or id: {id_or_code}")
+    task_id, team, nu = m.groups()
+    if task_id:
+        return (Task.id == int(task_id),)
+    return (Task.team == team, Task.nu == int(nu))
+
+
+def list_etag(session: Session, model: type[SQLModel], *clauses, extra: str = "") -> str:
+    """
+    Fingerprint barato de uma listagem: COUNT(*) + MAX(updated_at) do filtro.
+
+    Permite responder 304 Not Modified sem rodar o SELECT completo nem
+    serializar o payload quando o cliente já tem a versão atual.
+    """
+    count, latest = session.exec(select(func.count(), func.max(model.updated_at)).where(*clauses)).one()
+    return f'W/"{count}:{latest}:{extra}"'
+
+
+def etag_matches(request: Request, response: Response, etag: str) -> bool:
+    response.headers["ETag"] = etag
+    return request.headers.get("if-none-match") == etag
+
+
+def not_modified(etag: str) -> Response:
+    # O 304 repete o ETag (RFC 9110); headers do `response` injetado não são
+    # aplicados quando o handler devolve uma Response pronta.
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+def create_and_return(session: Session, model: type[SQLModel], values: dict):
+    """
+    Insere uma linha e a retorna na mesma query via INSERT ... RETURNING,
+    evitando o SELECT extra de um refresh.
+    """
+    return session.scalars(insert(model).values(**values).returning(model)).one()
+
+
+def resolve_task_id(session: Session, id_or_code: str) -> int:
+    """
+    Resolve um identificador ou código para o ID da tarefa, sem carregar a linha inteira.
+    """
+    task_id = session.exec(select(Task.id).where(*code_or_id_clauses(id_or_code))).first()
+    if task_id is None:
+        raise HTTPException(status_code=404, detail=f"Task {id_or_code} not found")
+    return task_id
+
+
 def get_task_by_code_or_id(session: Session, id_or_code: str):
     """
     Obtém uma tarefa com base em um identificador ou código.
@@ -69,10 +155,13 @@ def get_task_by_code_or_id(session: Session, id_or_code: str):
 
     Se uma string de `code` for fornecido, retorna a tarefa com esse código. (ex: DEV-1)
     """
-    if id_or_code.isdigit():
-        task = session.get(Task, int(id_or_code))
+    m = _CODE_RE.match(id_or_code)
+    if not m:
+        raise HTTPException(status_code=400, detail=f"Invalid task code or id: {id_or_code}")
+    task_id, team, nu = m.groups()
+    if task_id:
+        task = session.get(Task, int(task_id))
     else:
-        team, nu = id_or_code.split("-")
         task = session.exec(select(Task).where(Task.team == team, Task.nu == int(nu))).first()
 
     if not task:
@@ -80,41 +169,92 @@ def get_task_by_code_or_id(session: Session, id_or_code: str):
     return task
 
 
-def would_create_cycle(session: Session, source_id: int, target_id: int) -> bool:
-    """
-    Verifica se adicionar uma dependência source_id -> target_id criaria um ciclo.
-    """
-    visited = set()
+# Parte de :source (a tarefa que vai depender) e segue blocks -> blocked,
+# alcançando tudo que depende dela; se :target (o novo pré-requisito) está
+# nesse conjunto, ele já depende de :source e a aresta nova fecharia um ciclo.
+_CYCLE_CHECK = text(
+    "WITH RECURSIVE reach(id) AS ("
+    " SELECT :source"
+    " UNION"
+    " SELECT d.blocked FROM dependency d JOIN reach r ON d.blocks = r.id"
+    ") SELECT EXISTS(SELECT 1 FROM reach WHERE id = :target)"
+)
 
-    def dfs(task_id: int):
-        if task_id == source_id:
-            return True
-        visited.add(task_id)
 
-        blocked_tasks = session.exec(select(Dependency.blocked).where(Dependency.blocks == task_id)).all()
+def get_tasks_by_codes_or_ids(session: Session, ids_or_codes: list[str]) -> list[Task]:
+    """
+    Resolve vários identificadores ou códigos de tarefa de uma vez.
 
-        for next_id in blocked_tasks:
-            if next_id not in visited and dfs(next_id):
-                return True
+    Todos os IDs são buscados em uma query e todos os códigos em outra,
+    independente da quantidade de itens.
+    """
+    # Chaves normalizadas via int(): "007" e "REQ-01" casam com as chaves
+    # canônicas de `found` (str(id) e task.code), como nos demais resolvedores.
+    keys = []
+    for v in ids_or_codes:
+        if v.isdigit():
+            keys.append(str(int(v)))
+        else:
+            team, nu = v.split("-")
+            keys.append(f"{team}-{int(nu)}")
+
+    ids = {int(v) for v in ids_or_codes if v.isdigit()}
+    codes = {tuple(key.split("-")) for key in keys if not key.isdigit()}
+
+    found: dict[str, Task] = {}
+    if ids:
+        for task in session.exec(select(Task).where(Task.id.in_(ids))):
+            found[str(task.id)] = task
+    if codes:
+        pairs = [(team, int(nu)) for team, nu in codes]
+        for task in session.exec(select(Task).where(tuple_(Task.team, Task.nu).in_(pairs))):
+            found[task.code] = task
+
+    for v, key in zip(ids_or_codes, keys):
+        if key not in found:
+            raise HTTPException(status_code=404, detail=f"Task {v} not found")
+    return [found[key] for key in keys]
 
-        return False
 
-    return dfs(target_id)
+def would_create_cycle(session: Session, source_id: int, target_id: int) -> bool:
+    """
+    Verifica se adicionar uma dependência source_id -> target_id criaria um ciclo.
+
+    A travessia do grafo acontece dentro do banco via CTE recursiva (uma única
+    query em vez de um SELECT por nó visitado).
+    """
+    if engine.dialect.name in ("sqlite", "postgresql", "mysql"):
+        result = session.connection().execute(_CYCLE_CHECK, {"target": target_id, "source": source_id})
+        return bool(result.scalar())
+
+    # Fallback em Python para backends sem suporte a CTEs recursivas:
+    # BFS iterativa buscando as arestas de toda a fronteira em uma query
+    # por nível (em vez de uma por nó, e sem recursão).
+    visited: set[int] = set()
+    frontier = {source_id}
+    while frontier:
+        if target_id in frontier:
+            return True
+        visited |= frontier
+        rows = session.exec(select(Dependency.blocked).where(Dependency.blocks.in_(frontier))).all()
+        frontier = {blocked for blocked in rows if blocked not in visited}
+    return False
 
 
 @app.post("/case", response_model=Case, status_code=status.HTTP_201_CREATED)
 def create_case(case: CaseCreate, session: Session = Depends(get_session)):
     "Cria um caso de uso"
-    data = Case(**case.model_dump())
-    session.add(data)
+    data = create_and_return(session, Case, case.model_dump())
     session.commit()
-    session.refresh(data)
     return data
 
 
 @app.get("/case", response_model=list[Case])
-def read_cases(session: Session = Depends(get_session)):
+def read_cases(request: Request, response: Response, session: Session = Depends(get_read_session)):
     "Obtém casos de uso"
+    etag = list_etag(session, Case)
+    if etag_matches(request, response, etag):
+        return not_modified(etag)
     return session.exec(select(Case)).all()
 
 
@@ -124,14 +264,11 @@ def update_case(id: int, data_update: CasePatch, session: Session = Depends(get_
     data = session.get(Case, id)
     if not data:
         raise HTTPException(status_code=404, detail="Case not found")
-    try:
-        for key, value in data_update.model_dump(exclude_unset=True, exclude_none=True).items():
-            setattr(data, key, value)
-    except ValidationError as e:
-        raise HTTPException(status_code=422, detail=str(e))
+    updates = data_update.model_dump(exclude_unset=True, exclude_none=True)
+    for key in _CASE_MUTABLE & updates.keys():
+        setattr(data, key, updates[key])
     session.add(data)
     session.commit()
-    session.refresh(data)
     return data
 
 
@@ -145,45 +282,94 @@ def delete_case(id: int, session: Session = Depends(get_session)):
     session.commit()
 
 
+# Upsert atômico do contador por time: um único statement incrementa (ou cria)
+# a linha e devolve o próximo número, sem SELECT-then-UPDATE nem lock extra.
+_NEXT_NU = text(
+    "INSERT INTO teamtaskcounter (team_id, last_id) VALUES (:team, 1)"
+    " ON CONFLICT (team_id) DO UPDATE SET last_id = last_id + 1"
+    " RETURNING last_id"
+)
+
+
 @app.post("/task", response_model=Task, status_code=status.HTTP_201_CREATED)
 def create_task(task: TaskCreate, session: Session = Depends(get_session)):
     "Cria tarefa"
-    nu = 1 + (session.exec(select(func.max(Task.nu)).where(Task.team == task.team)).first() or 0)
-    data = Task(nu=nu, **task.model_dump(exclude={"dependencies"}))
+    # O tipo Enum do SQLAlchemy persiste o *nome* do membro ("development"),
+    # então o bind usa .name para casar com o que está na tabela.
+    nu = session.connection().execute(_NEXT_NU, {"team": task.team.name}).scalar_one()
+    data = create_and_return(session, Task, task.model_dump(exclude={"dependencies"}) | {"nu": nu})
     if task.dependencies:
-        try:
-            data.dependencies = [get_task_by_code_or_id(session, dep) for dep in task.dependencies]
-        except NoResultFound:
-            raise HTTPException(status_code=404, detail="One or more dependencies not found")
-    session.add(data)
+        deps = get_tasks_by_codes_or_ids(session, task.dependencies)
+        session.add_all(Dependency(blocks=dep.id, blocked=data.id) for dep in deps)
     session.commit()
-    session.refresh(data)
     return data
 
 
-@app.get("/task", response_model=list[Task])
-def read_tasks(team: TeamEnum = None, case_id: int = None, session: Session = Depends(get_session)):
+def task_filter_clauses(team: TeamEnum | None, case_id: int | None):
+    clauses = []
+    if team is not None:
+        clauses.append(Task.team == team)
+    if case_id is not None:
+        clauses.append(Task.case_id == case_id)
+    return clauses
+
+
+# Construído uma vez no import: o TypeAdapter compila o serializer da lista
+# inteira, em vez de um dispatch pydantic-core por elemento a cada request.
+_TASK_SUMMARY_ADAPTER = TypeAdapter(list[TaskSummary])
+
+
+@app.get("/task", response_model=list[TaskSummary])
+def read_tasks(request: Request, response: Response, team: TeamEnum = None, case_id: int = None, session: Session = Depends(get_read_session)):
     "Obtém tarefas"
-    query = select(Task)
+    etag = list_etag(session, Task, *task_filter_clauses(team, case_id))
+    if etag_matches(request, response, etag):
+        return not_modified(etag)
+    # lambda_stmt reaproveita a árvore de expressão compilada entre requests;
+    # só os parâmetros (team/case_id) mudam de uma chamada para outra.
+    # Selecionar só as colunas da listagem evita carregar `description`.
+    query = lambda_stmt(lambda: select(Task.id, Task.nu, Task.name, Task.team, Task.status, Task.case_id))
     if team is not None:
-        query = query.where(Task.team == team)
+        query += lambda s: s.where(Task.team == team)
     if case_id is not None:
-        query = query.where(Task.case_id == case_id)
-    return session.exec(query).all()
+        query += lambda s: s.where(Task.case_id == case_id)
+    items = [TaskSummary.model_construct(**row._mapping) for row in session.execute(query)]
+    # Resposta montada direto: pula a re-validação por item do FastAPI. O
+    # ETag vai junto porque headers do `response` injetado não são aplicados
+    # quando o handler devolve uma Response pronta.
+    return ORJSONResponse(
+        _TASK_SUMMARY_ADAPTER.dump_python(items, mode="json", by_alias=True),
+        headers={"ETag": etag},
+    )
 
 @app.get("/task-with-deps", response_model=list[TaskWithDependencies])
-def read_tasks_with_dependencies(team: TeamEnum = None, case_id: int = None, session: Session = Depends(get_session)):
+def read_tasks_with_dependencies(request: Request, response: Response, team: TeamEnum = None, case_id: int = None, session: Session = Depends(get_read_session)):
     "Obtém tarefas e suas dependências"
-    query = select(Task)
+    # As arestas entram no fingerprint porque adicionar/remover uma dependência
+    # não altera updated_at de nenhuma tarefa. Só contar não basta: trocar uma
+    # aresta por outra mantém o COUNT; a soma sobre os pares (blocks, blocked)
+    # muda com o conteúdo do grafo, independente da ordem.
+    edges, edge_sum = session.exec(
+        select(
+            func.count(),
+            func.coalesce(func.sum(Dependency.blocks * 100000 + Dependency.blocked), 0),
+        ).select_from(Dependency)
+    ).one()
+    etag = list_etag(session, Task, *task_filter_clauses(team, case_id), extra=f"{edges}:{edge_sum}")
+    if etag_matches(request, response, etag):
+        return not_modified(etag)
+    # selectinload carrega as dependências de todas as tarefas em uma única
+    # query IN (...), em vez de um SELECT por tarefa na serialização.
+    query = lambda_stmt(lambda: select(Task).options(selectinload(Task.dependencies)))
     if team is not None:
-        query = query.where(Task.team == team)
+        query += lambda s: s.where(Task.team == team)
     if case_id is not None:
-        query = query.where(Task.case_id == case_id)
-    return session.exec(query).all()
+        query += lambda s: s.where(Task.case_id == case_id)
+    return session.execute(query).scalars().all()
 
 
 @app.get("/task/{id}", response_model=Task)
-def read_task(id: CodeOrID, session: Session = Depends(get_session)):
+def read_task(id: CodeOrID, session: Session = Depends(get_read_session)):
     "Obtém tarefa com base em um identificador ou código"
     return get_task_by_code_or_id(session, id)
 
@@ -192,29 +378,40 @@ def read_task(id: CodeOrID, session: Session = Depends(get_session)):
 def update_task(id: CodeOrID, task_update: TaskPatch, session: Session = Depends(get_session)):
     "Atualiza tarefa do Usuário"
     task = get_task_by_code_or_id(session, id)
-    try:
-        for key, value in task_update.model_dump(exclude_unset=True, exclude_none=True).items():
-            setattr(task, key, value)
-    except ValidationError as e:
-        raise HTTPException(status_code=422, detail=str(e))
+    updates = task_update.model_dump(exclude_unset=True, exclude_none=True)
+    if "team" in updates and updates["team"] != task.team:
+        # Mudar de time muda a identidade do código: a tarefa recebe o próximo
+        # número do time de destino via contador, senão o nu antigo colidiria
+        # com uma tarefa existente (ou com o próximo POST /task) nesse time.
+        task.nu = session.connection().execute(_NEXT_NU, {"team": updates["team"].name}).scalar_one()
+        task.__dict__.pop("code", None)
+    for key in _TASK_MUTABLE & updates.keys():
+        setattr(task, key, updates[key])
     session.add(task)
     session.commit()
-    session.refresh(task)
     return task
 
 
 @app.delete("/task/{id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_task(id: CodeOrID, session: Session = Depends(get_session)):
     "Apaga tarefa do Usuário"
-    task = get_task_by_code_or_id(session, id)
-    session.delete(task)
+    result = session.exec(delete(Task).where(*code_or_id_clauses(id)))
+    if result.rowcount == 0:
+        raise HTTPException(status_code=404, detail=f"Task {id} not found")
     session.commit()
 
 
 @app.get("/task/{id}/depends", response_model=list[Task])
-def list_tasks_which_this_task_depends_on(id: CodeOrID, session: Session = Depends(get_session)):
+def list_tasks_which_this_task_depends_on(id: CodeOrID, session: Session = Depends(get_read_session)):
     "Lista as tarefas que devem ser feitas antes desta"
-    task = get_task_by_code_or_id(session, id)
+    stmt = (
+        select(Task)
+        .where(*code_or_id_clauses(id))
+        .options(selectinload(Task.dependencies), raiseload("*"))
+    )
+    task = session.exec(stmt).one_or_none()
+    if not task:
+        raise HTTPException(status_code=404, detail=f"Task {id} not found")
     return task.dependencies
 
 
@@ -240,12 +437,10 @@ def remove_task_dependency(task_a: CodeOrID, task_b: CodeOrID, session: Session
     """
     Remove a dependência de `task_b` como pré-requisito para a tarefa `task_a`
     """
-    task = get_task_by_code_or_id(session, task_a)
-    other = get_task_by_code_or_id(session, task_b)
+    task_id = resolve_task_id(session, task_a)
+    other_id = resolve_task_id(session, task_b)
 
-    dependency = session.get(Dependency, (task.id, other.id))
-    if not dependency:
+    result = session.exec(delete(Dependency).where(Dependency.blocks == other_id, Dependency.blocked == task_id))
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Dependency not found")
-
-    session.delete(dependency)
     session.commit()
@@ -1,31 +1,115 @@
 import datetime as dt
 import os
 from enum import StrEnum
+from functools import cached_property, lru_cache
 from typing import Annotated, Optional
 
-from pydantic import computed_field, create_model
+from pydantic import AfterValidator, ConfigDict, computed_field, create_model, field_validator
+from pydantic.fields import FieldInfo
+from sqlalchemy import Index, UniqueConstraint, event, func, text
 from sqlmodel import Field, Relationship, Session, SQLModel, create_engine
 from fastapi import Path
 
+# Prefixo + hífen lidos como um uint32: uma comparação de inteiro contra
+# quatro constantes no lugar de fatiar e comparar strings. Strings curtas ou
+# sem hífen produzem um inteiro que não está no conjunto.
+_PREFIX_INTS = frozenset(int.from_bytes(p.encode() + b"-", "little") for p in ("REQ", "DES", "DEV", "TES"))
+
+
+def _validate_code_or_id(value: str) -> str:
+    # Checagem direta (inteiro + isdigit) no lugar do motor de regex, que
+    # rodava em todo path param. O pattern continua exposto no schema OpenAPI.
+    if value.isdigit() or (int.from_bytes(value[:4].encode(), "little") in _PREFIX_INTS and value[4:].isdigit()):
+        return value
+    raise ValueError(f"Invalid task code or id: {value}")
+
+
 CodeOrID = Annotated[
-    str, Path(..., pattern=r"(REQ|DES|DEV|TES)-\d+$|^\d+", description="Task code (e.g., DEV-1) or ID (e.g., 1)", examples=["DEV-1", "TES-2", "REQ-15", "1"])
+    str,
+    AfterValidator(_validate_code_or_id),
+    Path(
+        ...,
+        description="Task code (e.g., DEV-1) or ID (e.g., 1)",
+        examples=["DEV-1", "TES-2", "REQ-15", "1"],
+        json_schema_extra={"pattern": r"(REQ|DES|DEV|TES)-\d+$|^\d+"},
+    ),
 ]
 
 # DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///:memory:")
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./database.db")
-engine = create_engine(DATABASE_URL, echo=False)
-
-
+_IS_SQLITE = DATABASE_URL.startswith("sqlite")
+_IN_MEMORY = ":memory:" in DATABASE_URL
+_engine_kwargs = dict(
+    echo=False,
+    pool_pre_ping=True,
+    pool_recycle=1800,
+    connect_args={"check_same_thread": False, "timeout": 30} if _IS_SQLITE else {},
+)
+
+
+def _register_sqlite_pragmas(eng, read_only: bool = False):
+    @event.listens_for(eng, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-64000")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+if _IS_SQLITE and not _IN_MEMORY:
+    # SQLite serializa escritas de qualquer forma: um único writer de longa
+    # duração evita contenção de lock, e os GETs escalam em conexões de
+    # leitura separadas (query_only) sem disputar o slot de escrita.
+    engine = create_engine(DATABASE_URL, **_engine_kwargs, pool_size=1, max_overflow=4)
+    read_engine = create_engine(DATABASE_URL, **_engine_kwargs, pool_size=8, max_overflow=8)
+    _register_sqlite_pragmas(engine)
+    _register_sqlite_pragmas(read_engine, read_only=True)
+elif _IS_SQLITE:
+    # SQLite em memória usa SingletonThreadPool (sem dimensionamento) e uma
+    # conexão só; leitores separados enxergariam outro banco.
+    engine = create_engine(DATABASE_URL, **_engine_kwargs)
+    read_engine = engine
+    _register_sqlite_pragmas(engine)
+else:
+    engine = create_engine(DATABASE_URL, **_engine_kwargs, pool_size=20, max_overflow=10)
+    read_engine = engine
+
+
+def _optional_field(f: FieldInfo, annotation: type) -> FieldInfo:
+    merged = FieldInfo.merge_field_infos(f, annotation=annotation)
+    # default e default_factory são mutuamente exclusivos; o merge manteria o
+    # factory do campo original junto com o novo default.
+    merged.default = None
+    merged.default_factory = None
+    return merged
+
+
+@lru_cache(maxsize=None)
 def patch(cls: type[SQLModel]) -> type[SQLModel]:
-    fields = cls.model_fields.copy()
-    for f in fields.values():
-        f.required = False
-        f.default = None
-    return create_model(f"{cls.__name__}Patch", **{n: (Optional[f.annotation], f) for n, f in fields.items()})
+    fields = {
+        n: (Optional[f.annotation], _optional_field(f, Optional[f.annotation]))
+        for n, f in cls.model_fields.items()
+    }
+    return create_model(f"{cls.__name__}Patch", __config__=ConfigDict(extra="ignore"), **fields)
 
 
 def get_session():
-    with Session(engine) as session:
+    # expire_on_commit=False mantém os atributos em memória após o commit,
+    # evitando um SELECT extra ao serializar a resposta.
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
+
+
+def get_read_session():
+    "Sessão somente leitura, servida pelo pool de conexões de leitura."
+    with Session(read_engine, expire_on_commit=False) as session:
         yield session
 
 
@@ -42,11 +126,22 @@ class TeamEnum(StrEnum):
     testing = "TES"
 
 
+# CURRENT_TIMESTAMP no SQLite tem granularidade de 1 segundo, o que faria
+# escritas no mesmo segundo produzirem o mesmo MAX(updated_at) — e com ele o
+# mesmo ETag para conteúdos diferentes. strftime('%f') preserva milissegundos.
+_DB_NOW = text("(strftime('%Y-%m-%d %H:%M:%f', 'now'))") if _IS_SQLITE else func.now()
+
+
 class DatabaseMixin:
-    created_at: dt.datetime = Field(default_factory=dt.datetime.now)
-    updated_at: dt.datetime = Field(
-        default_factory=dt.datetime.now,
-        sa_column_kwargs={"onupdate": dt.datetime.now},
+    # Timestamps calculados pelo banco; eager_defaults os traz de volta via
+    # RETURNING no mesmo INSERT/UPDATE, sem SELECT extra nem datetime.now()
+    # em Python a cada escrita.
+    __mapper_args__ = {"eager_defaults": True}
+
+    created_at: Optional[dt.datetime] = Field(default=None, sa_column_kwargs={"server_default": _DB_NOW})
+    updated_at: Optional[dt.datetime] = Field(
+        default=None,
+        sa_column_kwargs={"server_default": _DB_NOW, "onupdate": _DB_NOW},
     )
 
 
@@ -68,34 +163,65 @@ CasePatch = patch(CaseCreate)
 
 
 class TeamTaskCounter(SQLModel, table=True):
+    # Nunca validado a partir de JSON: adia a construção do schema
+    # pydantic-core, que só acontece se alguém chamar model_validate.
+    model_config = ConfigDict(defer_build=True)
+
     team_id: TeamEnum = Field(primary_key=True)
     last_id: int = 0
 
 
 class Dependency(SQLModel, table=True):
-    blocks: int = Field(..., foreign_key="task.id", primary_key=True)
-    blocked: int = Field(..., foreign_key="task.id", primary_key=True)
+    # O PK composto só indexa a coluna inicial; o índice reverso cobre as
+    # buscas por `blocked` (relacionamento inverso e detecção de ciclos).
+    __table_args__ = (Index("ix_dependency_blocked_blocks", "blocked", "blocks"),)
+    model_config = ConfigDict(defer_build=True)
+
+    blocks: int = Field(..., foreign_key="task.id", primary_key=True, ondelete="CASCADE")
+    blocked: int = Field(..., foreign_key="task.id", primary_key=True, ondelete="CASCADE")
+
+
+# Lookup direto valor -> membro: entrega o enum pronto ao pydantic, pulando o
+# caminho genérico de coerção de EnumMeta.__call__.
+_TEAM_BY_STR = {e.value: e for e in TeamEnum}
+_STATUS_BY_STR = {e.value: e for e in StatusEnum}
 
 
 class TaskBase(SQLModel):
-    case_id: int = Field(foreign_key="case.id", description="ID of the use case this task belongs to")
+    case_id: int = Field(foreign_key="case.id", index=True, description="ID of the use case this task belongs to")
     name: str = Field(max_length=100)
     description: str = Field(max_length=500)
     status: StatusEnum = Field(...)
     team: TeamEnum = Field(default=TeamEnum.development, description="Team responsible for the task")
 
+    @field_validator("team", mode="before")
+    @classmethod
+    def _team_fast_path(cls, value):
+        return _TEAM_BY_STR.get(value, value) if isinstance(value, str) else value
+
+    @field_validator("status", mode="before")
+    @classmethod
+    def _status_fast_path(cls, value):
+        return _STATUS_BY_STR.get(value, value) if isinstance(value, str) else value
+
 
 class TaskPublic(TaskBase, DatabaseMixin):
     id: int = Field(primary_key=True, schema_extra=dict(serialization_alias="task_id"), description="Task ID")
     nu: int = Field(description="Task number in the team")
 
     @computed_field
-    @property
+    @cached_property
     def code(self) -> str:
+        # cached_property guarda a string no __dict__ da instância: listas
+        # grandes não pagam um f-string novo a cada serialização.
         return f"{self.team}-{self.nu}"
 
 
 class Task(TaskPublic, table=True):
+    # (team, nu) é a identidade do código `REQ-1`: o índice único transforma a
+    # resolução de código em seek e garante que o contador por time não repita.
+    __table_args__ = (UniqueConstraint("team", "nu", name="uq_task_team_nu"),)
+
     case: Case = Relationship(back_populates="tasks")
     dependencies: list["Task"] = Relationship(
         link_model=Dependency,
@@ -107,6 +233,25 @@ class Task(TaskPublic, table=True):
     )
 
 
+class TaskSummary(SQLModel):
+    """
+    Visão enxuta de `Task` para listagens: sem `description` (até 500 chars)
+    nem timestamps, que a UI de listagem não usa.
+    """
+
+    id: int = Field(schema_extra=dict(serialization_alias="task_id"), description="Task ID")
+    nu: int = Field(description="Task number in the team")
+    name: str
+    team: TeamEnum
+    status: StatusEnum
+    case_id: int
+
+    @computed_field
+    @cached_property
+    def code(self) -> str:
+        return f"{self.team}-{self.nu}"
+
+
 class TaskCreate(TaskBase):
     dependencies: list[CodeOrID] = Field(description="List of task IDs that this task depends on", default_factory=list)
 